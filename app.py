@@ -2,126 +2,434 @@ import pandas as pd
 import numpy as np
 import yfinance as yf
 import streamlit as st
+from collections import namedtuple
 from datetime import datetime
-import ta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import io
+import os
+import pickle
 import re
 
-# ========== Technical Indicators ========== #
-def calculate_technical_indicators(df):
-    df = df.copy()
-    df.index = pd.to_datetime(df.index)
-    df = df.sort_index()
+from indicators import NUMBA_AVAILABLE, macd_diff, momentum_final, bb_width, vwap_close, scan_all
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
 
-    df['price_change_pct'] = df['Close'].pct_change().fillna(0) * 100
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+
+# Compiled once: the scan cleans every symbol in the sheet with this.
+_SUFFIX_RE = re.compile(r'\.(NS|BO|NSE|BSE)$', re.IGNORECASE)
+
+# ========== Data Download ========== #
+# Connection reuse is yfinance's job: it transports via curl_cffi and ignores
+# injected requests.Session objects, so resilience here is the batch-level
+# retry below plus the bulk_download memo, not adapter/Retry configuration.
+BATCH_SIZE = 20
+OHLCV_COLS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+class IncompleteDownloadError(Exception):
+    """Some batches failed after retries; carries whatever data did arrive.
+
+    Raised instead of returned so the st.cache_data memo on bulk_download
+    never pins a partial universe — a rescan after connectivity recovers
+    refetches instead of replaying the failure for the rest of the ttl.
+    """
+    def __init__(self, data_by_symbol, failed_batches):
+        super().__init__(f'{len(failed_batches)} download batch(es) failed')
+        self.data_by_symbol = data_by_symbol
+
+def download_ohlcv(yf_symbols, period='100d'):
+    """Download OHLCV for all symbols in batches to avoid one HTTP round-trip per ticker."""
+    data_by_symbol = {}
+    failed_batches = []
+    for start in range(0, len(yf_symbols), BATCH_SIZE):
+        batch = yf_symbols[start:start + BATCH_SIZE]
+        bulk = None
+        error = None
+        for _ in range(2):  # one retry per batch; a flaky batch shouldn't drop 20 symbols
+            try:
+                # No custom session here: current yfinance rejects caching
+                # sessions outright, so repeat-scan reuse lives in the
+                # bulk_download memo instead of the HTTP layer.
+                tickers = yf.Tickers(' '.join(batch))
+                bulk = tickers.history(period=period, group_by='ticker',
+                                       threads=True, auto_adjust=True, progress=False)
+            except Exception as e:
+                bulk = None
+                error = e
+            if bulk is not None and not bulk.empty:
+                break
+        if bulk is None or bulk.empty:
+            # A dropped batch is 20 silently missing symbols; say so.
+            reason = f": {error}" if error is not None else " (empty response)"
+            st.warning(f"Download failed for {batch[0]}..{batch[-1]}{reason}")
+            failed_batches.append(batch)
+            continue
+        for sym in batch:
+            try:
+                if isinstance(bulk.columns, pd.MultiIndex):
+                    df = bulk.xs(sym, axis=1, level=0).dropna(how='all')
+                else:
+                    # Single-symbol batch comes back with flat columns
+                    df = bulk.dropna(how='all')
+            except KeyError:
+                continue
+            if not df.empty:
+                # Prices carry ~5 significant digits; float32 halves the bytes
+                # every downstream rolling/EMA pass has to move.
+                df = df.astype({c: np.float32 for c in OHLCV_COLS if c in df.columns})
+                data_by_symbol[sym] = df
+    if failed_batches:
+        raise IncompleteDownloadError(data_by_symbol, failed_batches)
+    return data_by_symbol
+
+@st.cache_data(ttl=1800, show_spinner=False)
+def bulk_download(yf_symbols, period='100d'):
+    """Memoized batch download keyed by (symbols tuple, period).
+
+    Repeat scans of the same sheet within the ttl skip the network and the
+    multi-index re-parsing entirely. Pass a sorted tuple so equivalent
+    universes share an entry. Only complete downloads are memoized —
+    IncompleteDownloadError propagates past the cache, so a rescan retries
+    the missing symbols instead of replaying the failure.
+    """
+    return download_ohlcv(list(yf_symbols), period)
 
-    vol_window = min(10, len(df) - 1)
+# ========== Technical Indicators ========== #
+# EMA/RSI recurrences forget their seed geometrically; ~3x the slowest span
+# (26) of warm-up bars reproduces the final value to well past display
+# precision, so the momentum kernels never need the full 100-day window.
+INDICATOR_TAIL = 80
+
+def latest_indicators(high, low, close, volume):
+    """Final-bar scoring fields straight from raw OHLCV arrays.
+
+    The scan only ever reads the last row, so nothing here allocates a
+    100-day indicator column — each field comes out as a scalar.
+    """
+    n = len(close)
+    feats = dict(zip(_SCORE_FIELDS, _SCORE_DEFAULTS))
+    if n == 0:
+        return Latest(**feats)
+
+    if n > 1 and close[-2] > 0:
+        feats['price_change_pct'] = (close[-1] - close[-2]) / close[-2] * 100
+
+    vol_window = min(VOL_WINDOW, n - 1)
     if vol_window > 1:
-        vol_avg = df['Volume'].rolling(vol_window, min_periods=1).mean()
-        df['volume_change_pct'] = ((df['Volume'] / vol_avg) - 1).fillna(0) * 100
+        vol_avg = volume[-vol_window:].mean()
+        if vol_avg > 0:
+            feats['volume_change_pct'] = (volume[-1] / vol_avg - 1) * 100
+
+    feats['vwap_diff'], feats['close_position'] = vwap_close(high, low, close, volume)
+
+    window = min(RSI_WINDOW, n - 1)
+    if window > 1:
+        feats['rsi'], feats['macd_diff'] = momentum_final(close[-INDICATOR_TAIL:], window)
     else:
-        df['volume_change_pct'] = 0
+        feats['macd_diff'] = float(macd_diff(close)[-1])
 
-    try:
-        typical_price = (df['High'] + df['Low'] + df['Close']) / 3
-        df['vwap'] = (typical_price * df['Volume']).cumsum() / df['Volume'].cumsum()
-        df['vwap_diff'] = ((df['Close'] - df['vwap']) / (df['vwap'] + 1e-8)).fillna(0) * 100
-    except:
-        df['vwap'] = df['Close']
-        df['vwap_diff'] = 0
+    if n > BB_WINDOW:
+        feats['bb_width'] = bb_width(close, BB_WINDOW)
 
-    try:
-        range_val = df['High'] - df['Low'] + 1e-8
-        df['close_position'] = (df['Close'] - df['Low']) / range_val
-        df['close_position'] = df['close_position'].fillna(0.5)
-    except:
-        df['close_position'] = 0.5
+    return Latest(**feats)
 
+# ========== Scoring Function ========== #
+_SCORE_FIELDS = ('price_change_pct', 'volume_change_pct', 'rsi', 'macd_diff',
+                 'bb_width', 'close_position', 'vwap_diff')
+_SCORE_DEFAULTS = (0.0, 0.0, 50.0, 0.0, 0.0, 0.5, 0.0)
+_SCORE_DEFAULT_COL = np.array(_SCORE_DEFAULTS, dtype=np.float32)[:, None]
+
+# SoA view of the latest bar: attribute access is C-level, no per-field hashing.
+Latest = namedtuple('Latest', _SCORE_FIELDS)
+
+# Threshold/points tables for the bucketed score components. Bucket index is
+# "how many thresholds the value strictly exceeds", i.e. searchsorted left.
+_PC_THR = np.array([1.0, 2.0, 3.0], dtype=np.float32)
+_PC_PTS = np.array([0, 10, 20, 30], dtype=np.int32)
+_VC_THR = np.array([50.0, 100.0, 150.0], dtype=np.float32)
+_VC_PTS = np.array([0, 10, 15, 20], dtype=np.int32)
+_CP_THR = np.array([0.6, 0.7, 0.8], dtype=np.float32)
+_CP_PTS = np.array([0, 10, 15, 20], dtype=np.int32)
+_VW_THR = np.array([0.5, 1.0], dtype=np.float32)
+_VW_PTS = np.array([0, 5, 10], dtype=np.int32)
+
+# Recommendation bins share the bucketing trick: digitize into a label table.
+_REC_THR = np.array([40, 65, 85], dtype=np.int32)
+_REC_LABELS = np.array(["Avoid", "Neutral", "Watch", "Strong Buy"])
+
+def score_universe(feats):
+    """Score every symbol in one vectorized pass.
+
+    `feats` is the (n_fields, n_symbols) float32 matrix with rows in
+    _SCORE_FIELDS order, C-contiguous so each field is a contiguous 1-D
+    view — ideal for the bucketing lookups and SIMD ufuncs.
+    """
+    # searchsorted sorts NaN above every threshold, which would hand bad
+    # bars maximum bucket points; swap NaNs for the neutral defaults first.
+    feats = np.where(np.isnan(feats), _SCORE_DEFAULT_COL, feats)
+    pc, vc, rsi_v, macd_v, bb_v, cp, vw = feats
+
+    # Branchless: each if/elif ladder becomes a table lookup.
+    score = _PC_PTS[np.searchsorted(_PC_THR, pc, side='left')]
+    score = score + _VC_PTS[np.searchsorted(_VC_THR, vc, side='left')]
+
+    # Everything below can add at most 55 points, and only names reaching the
+    # Watch line (65) survive the pick filter — skip the rest of the compute
+    # for symbols that mathematically can't get there. Their reported score is
+    # then a lower bound, which the <65 buckets can live with.
+    remaining_max = 55
+    active = score + remaining_max >= 65
+    if active.any():
+        rsi_a, macd_a, bb_a, cp_a, vw_a = rsi_v[active], macd_v[active], bb_v[active], cp[active], vw[active]
+        extra = 10 * ((rsi_a > 55) & (rsi_a < 70))
+        extra = extra + 10 * (macd_a > 0)
+        extra = extra + 5 * (bb_a > 0.1)
+        extra = extra + _CP_PTS[np.searchsorted(_CP_THR, cp_a, side='left')]
+        extra = extra + _VW_PTS[np.searchsorted(_VW_THR, vw_a, side='left')]
+        score[active] += extra
+    return np.minimum(score, 100)
+
+# ========== Streaming Indicator State ========== #
+# Only one bar arrives per trading day, so re-running the full 100-day
+# indicator pipeline on every scan is wasted work. Each symbol keeps a small
+# pickled state of EMA/Wilder accumulators that gets updated in O(1) per new
+# bar; warm re-scans read the latest features straight from this state.
+STATE_DIR = 'state'
+RSI_WINDOW = 14
+BB_WINDOW = 20
+VOL_WINDOW = 10
+
+def _new_state():
+    return {'last_date': None, 'prev_close': None, 'close': None, 'high': None, 'low': None,
+            'ema12': None, 'ema26': None, 'macd_signal': 0.0,
+            'avg_gain': 0.0, 'avg_loss': 0.0,
+            'sum_pv': 0.0, 'sum_v': 0.0,
+            'closes': [], 'vols': []}
+
+def _state_path(sym):
+    return os.path.join(STATE_DIR, f'{sym}.pkl')
+
+def _load_state(sym):
     try:
-        rsi = ta.momentum.RSIIndicator(close=df['Close'], window=min(14, len(df) - 1))
-        df['rsi'] = rsi.rsi().fillna(50)
-    except:
-        df['rsi'] = 50
+        with open(_state_path(sym), 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return None
 
+def _save_state(sym, state):
     try:
-        macd = ta.trend.MACD(close=df['Close'])
-        df['macd_diff'] = macd.macd_diff().fillna(0)
-    except:
-        df['macd_diff'] = 0
-
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with open(_state_path(sym), 'wb') as f:
+            pickle.dump(state, f)
+    except Exception:
+        pass
+
+def _state_matches(state, data):
+    """True when the stored state still lines up with the downloaded bars.
+
+    auto_adjust rewrites past closes after a dividend or split, leaving the
+    saved accumulators in the old price scale — folding new bars onto them
+    would report a split as a crash and poison RSI/MACD for weeks. The
+    state's last bar is always inside the downloaded window, so re-checking
+    its close against the fresh data is a cheap staleness probe; mismatches
+    send the symbol back through the cold path.
+    """
+    if state is None or state.get('last_date') is None or state.get('close') is None:
+        return False
     try:
-        if len(df) > 20:
-            bb = ta.volatility.BollingerBands(close=df['Close'])
-            df['bb_width'] = bb.bollinger_wband().fillna(0)
+        downloaded = float(data['Close'].loc[state['last_date']])
+    except Exception:
+        return False
+    return abs(downloaded - state['close']) <= 1e-3 * max(abs(state['close']), 1.0)
+
+def update_indicators(state, new_bars):
+    """Fold new OHLCV bars into the streaming state, O(1) work per bar."""
+    a12, a26, a9 = 2.0 / 13.0, 2.0 / 27.0, 2.0 / 10.0
+    wilder = 1.0 / RSI_WINDOW
+
+    for row in new_bars.itertuples():
+        c = float(row.Close)
+        h = float(getattr(row, 'High', c))
+        l = float(getattr(row, 'Low', c))
+        v = float(getattr(row, 'Volume', 0) or 0)
+
+        if state['close'] is not None:
+            delta = c - state['close']
+            state['avg_gain'] += wilder * (max(delta, 0.0) - state['avg_gain'])
+            state['avg_loss'] += wilder * (max(-delta, 0.0) - state['avg_loss'])
+        state['prev_close'] = state['close']
+
+        if state['ema12'] is None:
+            state['ema12'] = state['ema26'] = c
         else:
-            df['bb_width'] = 0
-    except:
-        df['bb_width'] = 0
-
-    return df
-
-# ========== Scoring Function ========== #
-# ========== Scoring Function ========== #
-def calculate_btst_score(row):
-    score = 0
-
-    # Helper function to safely extract scalar values
-    def get_scalar(value):
-        if isinstance(value, pd.Series):
-            return value.iloc[0]  # Extract first element from Series
-        return value  # Return directly if not a Series
-
+            state['ema12'] += a12 * (c - state['ema12'])
+            state['ema26'] += a26 * (c - state['ema26'])
+        macd = state['ema12'] - state['ema26']
+        state['macd_signal'] += a9 * (macd - state['macd_signal'])
+
+        state['sum_pv'] += (h + l + c) / 3.0 * v
+        state['sum_v'] += v
+        state['closes'] = (state['closes'] + [c])[-BB_WINDOW:]
+        state['vols'] = (state['vols'] + [v])[-VOL_WINDOW:]
+
+        state['close'], state['high'], state['low'] = c, h, l
+        state['last_date'] = row.Index
+
+    return state
+
+def state_features(state):
+    """Latest scoring fields derived from the streaming state."""
+    feats = dict(zip(_SCORE_FIELDS, _SCORE_DEFAULTS))
+    if state['close'] is None:
+        return Latest(**feats)
+    c = state['close']
+
+    if state['prev_close']:
+        feats['price_change_pct'] = (c - state['prev_close']) / state['prev_close'] * 100
+
+    vols = state['vols']
+    if len(vols) > 1 and sum(vols) > 0:
+        feats['volume_change_pct'] = (vols[-1] / (sum(vols) / len(vols)) - 1) * 100
+
+    if state['sum_v'] > 0:
+        vwap = state['sum_pv'] / state['sum_v']
+        feats['vwap_diff'] = (c - vwap) / (vwap + 1e-8) * 100
+
+    feats['close_position'] = (c - state['low']) / (state['high'] - state['low'] + 1e-8)
+
+    rs = state['avg_gain'] / max(state['avg_loss'], 1e-12)
+    feats['rsi'] = 100.0 - 100.0 / (1.0 + rs)
+
+    feats['macd_diff'] = (state['ema12'] - state['ema26']) - state['macd_signal']
+
+    closes = state['closes']
+    if len(closes) == BB_WINDOW:
+        mean = sum(closes) / BB_WINDOW
+        std = (sum((x - mean) ** 2 for x in closes) / BB_WINDOW) ** 0.5
+        feats['bb_width'] = 4.0 * std / max(mean, 1e-12) * 100.0
+
+    return Latest(**feats)
+
+# ========== Symbol Processing ========== #
+MAX_WORKERS = 8
+
+def process_symbol(clean_symbol, yf_symbol, data):
+    """Compute indicators and the BTST score for one symbol's OHLCV frame."""
+    for col in OHLCV_COLS:
+        if col not in data.columns:
+            data[col] = data['Close']
+
+    # yfinance already returns bars in date order; only pay for a sort (and
+    # its full-frame allocation) in the odd case it doesn't.
+    if not data.index.is_monotonic_increasing:
+        data = data.sort_index()
+
+    state = _load_state(yf_symbol)
+    if _state_matches(state, data):
+        # Warm path: fold only the bars we haven't seen yet (usually 0-1).
+        state = update_indicators(state, data[data.index > state['last_date']])
+        feats = state_features(state)
+        price = state['close']
+        day_change = feats.price_change_pct
+    else:
+        # Cold path: scalar indicators from the raw arrays, then seed the state.
+        # One block extraction instead of four column lookups; stays float32
+        # end-to-end (the kernels carry float64 accumulators where it counts).
+        high, low, close, volume = np.ascontiguousarray(
+            data[['High', 'Low', 'Close', 'Volume']].to_numpy(dtype=np.float32).T)
+        feats = latest_indicators(high, low, close, volume)
+        price = close[-1]
+        day_change = feats.price_change_pct
+        state = update_indicators(_new_state(), data)
+    _save_state(yf_symbol, state)
+
+    # Scoring and display formatting both happen vectorized over the whole
+    # universe, so per symbol we hand back nothing but plain scalars.
+    return price, day_change, feats
+
+def process_cold_batch(items):
+    """All cold symbols in one prange kernel call instead of N Python passes.
+
+    Stacks the per-symbol OHLCV frames into padded (n_symbols, max_bars)
+    arrays, runs scan_all across the symbol axis, and seeds each symbol's
+    streaming state from the returned recurrence accumulators — no
+    Python-level walk over the bars at all. `items` is a list of
+    (slot, (clean_symbol, yf_symbol, data)) tuples; yields per-symbol results
+    in the same shape process_symbol returns, prefixed with the slot.
+    """
+    count = len(items)
+    blocks = []
+    for _, (_, _, data) in items:
+        for col in OHLCV_COLS:
+            if col not in data.columns:
+                data[col] = data['Close']
+        if not data.index.is_monotonic_increasing:
+            data = data.sort_index()
+        blocks.append(np.ascontiguousarray(
+            data[['High', 'Low', 'Close', 'Volume']].to_numpy(dtype=np.float32).T))
+
+    max_len = max(block.shape[1] for block in blocks)
+    lengths = np.array([block.shape[1] for block in blocks], dtype=np.int64)
+    high = np.zeros((count, max_len), dtype=np.float32)
+    low = np.zeros_like(high)
+    close = np.zeros_like(high)
+    volume = np.zeros_like(high)
+    for j, block in enumerate(blocks):
+        m = block.shape[1]
+        high[j, :m], low[j, :m], close[j, :m], volume[j, :m] = block
+
+    feats, accum = scan_all(high, low, close, volume, lengths,
+                            RSI_WINDOW, BB_WINDOW, VOL_WINDOW, INDICATOR_TAIL)
+
+    out = []
+    for j, (slot, (clean_symbol, yf_symbol, data)) in enumerate(items):
+        h, l, c, v = blocks[j]
+        state = _new_state()
+        state['last_date'] = data.index[-1]
+        state['prev_close'] = float(c[-2]) if len(c) > 1 else None
+        state['close'], state['high'], state['low'] = float(c[-1]), float(h[-1]), float(l[-1])
+        (state['ema12'], state['ema26'], state['macd_signal'],
+         state['avg_gain'], state['avg_loss'],
+         state['sum_pv'], state['sum_v']) = accum[:, j]
+        state['closes'] = [float(x) for x in c[-BB_WINDOW:]]
+        state['vols'] = [float(x) for x in v[-VOL_WINDOW:]]
+        _save_state(yf_symbol, state)
+
+        out.append((slot, float(c[-1]), float(feats[0, j]), feats[:, j]))
+    return out
+
+# ========== Stock List ========== #
+# st.cache_data hides the Excel parse within one server process, but the
+# openpyxl hit still lands on every app restart. Sheets convert to Parquet on
+# first read; every restart after that skips the Excel parser entirely.
+PARQUET_CACHE_DIR = '.cache'
+
+@st.cache_data(show_spinner=False)
+def load_sheet_names(path):
+    return pd.ExcelFile(path).sheet_names
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def load_sheet(path, sheet):
+    cached = os.path.join(PARQUET_CACHE_DIR, f'stocklist_{sheet}.parquet')
+    try:
+        if os.path.getmtime(cached) >= os.path.getmtime(path):
+            return pd.read_parquet(cached)
+    except OSError:
+        pass
+    df = pd.read_excel(path, sheet_name=sheet)
     try:
-        # Extract values safely
-        price_change = get_scalar(row['price_change_pct']) if 'price_change_pct' in row else 0
-        vol_change = get_scalar(row['volume_change_pct']) if 'volume_change_pct' in row else 0
-        rsi = get_scalar(row['rsi']) if 'rsi' in row else 50
-        macd_diff = get_scalar(row['macd_diff']) if 'macd_diff' in row else 0
-        bb_width = get_scalar(row['bb_width']) if 'bb_width' in row else 0
-        close_pos = get_scalar(row['close_position']) if 'close_position' in row else 0.5
-        vwap_diff = get_scalar(row['vwap_diff']) if 'vwap_diff' in row else 0
-
-        # Scoring logic remains the same
-        if price_change > 3:
-            score += 30
-        elif price_change > 2:
-            score += 20
-        elif price_change > 1:
-            score += 10
-
-        if vol_change > 150:
-            score += 20
-        elif vol_change > 100:
-            score += 15
-        elif vol_change > 50:
-            score += 10
-
-        if 55 < rsi < 70:
-            score += 10
-
-        if macd_diff > 0:
-            score += 10
-
-        if bb_width > 0.1:
-            score += 5
-
-        if close_pos > 0.8:
-            score += 20
-        elif close_pos > 0.7:
-            score += 15
-        elif close_pos > 0.6:
-            score += 10
-
-        if vwap_diff > 1:
-            score += 10
-        elif vwap_diff > 0.5:
-            score += 5
-
-    except KeyError as e:
-        st.warning(f"Missing indicator in scoring: {e}")
-    except Exception as e:
-        st.warning(f"Error in scoring: {e}")
-
-    return min(score, 100)
+        os.makedirs(PARQUET_CACHE_DIR, exist_ok=True)
+        df.to_parquet(cached)
+    except Exception:
+        pass
+    return df
 
 # ========== Streamlit App ========== #
 st.set_page_config(page_title="Momentum Overnight Pro", layout="wide")
@@ -130,7 +438,7 @@ st.subheader('AI-Powered BTST Opportunity Scanner')
 
 # Load Excel Sheets
 try:
-    stock_sheets = pd.ExcelFile('stocklist.xlsx').sheet_names
+    stock_sheets = load_sheet_names('stocklist.xlsx')
 except FileNotFoundError:
     st.error("Error: stocklist.xlsx file not found.")
     st.stop()
@@ -141,70 +449,135 @@ market_choice = st.radio("Market Exchange", ['NSE', 'BSE'], index=0)
 if st.button("🔍 Scan BTST Opportunities"):
     with st.spinner(f"Scanning {selected_sheet}..."):
         try:
-            symbols_df = pd.read_excel('stocklist.xlsx', sheet_name=selected_sheet)
+            symbols_df = load_sheet('stocklist.xlsx', selected_sheet)
             if 'Symbol' not in symbols_df.columns:
                 st.error("Sheet must contain a 'Symbol' column.")
                 st.stop()
 
-            symbols = symbols_df['Symbol'].astype(str).str.strip().str.upper().tolist()
+            clean_symbols = (symbols_df['Symbol'].astype(str).str.strip().str.upper()
+                             .str.replace(_SUFFIX_RE, '', regex=True).tolist())
             suffix = '.NS' if market_choice == 'NSE' else '.BO'
             benchmark = '^NSEI' if market_choice == 'NSE' else '^BSESN'
 
-            # Check market strength
-            try:
-                nifty = yf.download(benchmark, period='2d', progress=False)
-                market_strength = "Bullish" if len(nifty) >= 2 and nifty['Close'][-1] > nifty['Close'][-2] else "Bearish"
-            except:
-                market_strength = "Unknown"
+            # Market strength is independent of the symbol scan, so its RTT
+            # hides under the batched symbol download below.
+            benchmark_pool = ThreadPoolExecutor(max_workers=1)
+            benchmark_future = benchmark_pool.submit(yf.download, benchmark, period='2d',
+                                                     progress=False)
 
-            results = []
             progress_bar = st.progress(0)
             status_text = st.empty()
 
-            for i, symbol in enumerate(symbols):
-                clean_symbol = re.sub(r'\.(NS|BO|NSE|BSE)$', '', symbol, flags=re.IGNORECASE)
-                yf_symbol = clean_symbol + suffix
-
-                try:
-                    data = yf.download(yf_symbol, period='100d', progress=False, auto_adjust=True)
-                    if data is None or data.empty or len(data) < 20:
-                        continue
-
-                    for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
-                        if col not in data.columns:
-                            data[col] = data['Close']
-
-                    data = calculate_technical_indicators(data)
-                    latest = data.iloc[-1]
-                    score = calculate_btst_score(latest)
+            yf_symbols = [s + suffix for s in clean_symbols]
+            try:
+                data_by_symbol = bulk_download(tuple(sorted(set(yf_symbols))))
+            except IncompleteDownloadError as incomplete:
+                # Scan what arrived, but leave the memo empty so the next
+                # click refetches the dropped batches.
+                data_by_symbol = incomplete.data_by_symbol
 
-                    if len(data) >= 2:
-                        prev_close = data['Close'].iloc[-2]
-                        day_change = (latest['Close'] - prev_close) / prev_close * 100
-                    else:
-                        day_change = 0
-
-                    results.append({
-                        'Symbol': clean_symbol,
-                        'Score': score,
-                        'Price': latest['Close'],
-                        'Change (%)': round(day_change, 2),
-                        'Volume Spike (%)': round(latest.get('volume_change_pct', 0), 2),
-                        'RSI': round(latest.get('rsi', 50), 2),
-                        'Position': "Near High" if latest.get('close_position', 0) > 0.7 else "Mid" if latest.get('close_position', 0) > 0.5 else "Near Low",
-                        'VWAP Diff (%)': round(latest.get('vwap_diff', 0), 2)
-                    })
+            try:
+                nifty = benchmark_future.result()
+                market_strength = "Bullish" if len(nifty) >= 2 and nifty['Close'][-1] > nifty['Close'][-2] else "Bearish"
+            except:
+                market_strength = "Unknown"
+            finally:
+                benchmark_pool.shutdown(wait=False)
+
+            tasks = []
+            for clean_symbol, yf_symbol in zip(clean_symbols, yf_symbols):
+                data = data_by_symbol.get(yf_symbol)
+                if data is None or data.empty or len(data) < 20:
+                    continue
+                tasks.append((clean_symbol, yf_symbol, data))
+
+            # Columnar accumulators: one typed array per output field, written
+            # by slot index as futures complete — no per-symbol result dicts.
+            n_tasks = len(tasks)
+            arr_symbol = np.empty(n_tasks, dtype=object)
+            arr_price = np.empty(n_tasks, dtype=np.float32)
+            arr_change = np.empty(n_tasks, dtype=np.float32)
+            arr_feats = np.empty((len(_SCORE_FIELDS), n_tasks), dtype=np.float32)
+            valid = np.zeros(n_tasks, dtype=bool)
+
+            # Symbols without streaming state get one batched prange kernel
+            # call across all of them; warm symbols (and everything when numba
+            # is missing) go through the per-symbol threaded path.
+            cold, warm = [], []
+            for slot, task in enumerate(tasks):
+                # Stale states (adjusted history rewrote past closes) rejoin
+                # the cold batch rather than folding onto bad accumulators.
+                if NUMBA_AVAILABLE and not _state_matches(_load_state(task[1]), task[2]):
+                    cold.append((slot, task))
+                else:
+                    warm.append((slot, task))
 
+            done = 0
+            if cold:
+                try:
+                    for slot, price, day_change, feats in process_cold_batch(cold):
+                        arr_symbol[slot] = tasks[slot][0]
+                        arr_price[slot] = price
+                        arr_change[slot] = day_change
+                        arr_feats[:, slot] = feats
+                        valid[slot] = True
                 except Exception as e:
-                    st.warning(f"Error processing {symbol}: {str(e)}")
-
-                progress_bar.progress((i + 1) / len(symbols))
-                status_text.text(f"Processed {i+1}/{len(symbols)}: {clean_symbol} | Market: {market_strength}")
+                    st.warning(f"Batched scan failed, retrying symbols individually: {str(e)}")
+                    warm = warm + cold
+                else:
+                    done = len(cold)
+                    progress_bar.progress(done / len(tasks))
+                    status_text.text(f"Processed {done}/{len(tasks)} | Market: {market_strength}")
+
+            if warm:
+                with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(warm))) as executor:
+                    futures = {executor.submit(process_symbol, sym, yf_sym, data): (slot, sym)
+                               for slot, (sym, yf_sym, data) in warm}
+                    for future in as_completed(futures):
+                        slot, sym = futures[future]
+                        try:
+                            price, day_change, feats = future.result()
+                            arr_symbol[slot] = sym
+                            arr_price[slot] = price
+                            arr_change[slot] = day_change
+                            arr_feats[:, slot] = feats
+                            valid[slot] = True
+                        except Exception as e:
+                            st.warning(f"Error processing {sym}: {str(e)}")
+
+                        done += 1
+                        progress_bar.progress(done / len(tasks))
+                        status_text.text(f"Processed {done}/{len(tasks)}: {sym} | Market: {market_strength}")
 
             # Display Results
-            if results:
-                df = pd.DataFrame(results).sort_values("Score", ascending=False).reset_index(drop=True)
-                df['Recommendation'] = pd.cut(df['Score'], bins=[0, 40, 65, 85, 100], labels=["Avoid", "Neutral", "Watch", "Strong Buy"])
+            if valid.any():
+                feat_mat = np.ascontiguousarray(arr_feats[:, valid])
+                vc, rsi_v, cp, vw = feat_mat[1], feat_mat[2], feat_mat[5], feat_mat[6]
+                scores = score_universe(feat_mat)
+                feat_df = pd.DataFrame({
+                    'Symbol': arr_symbol[valid],
+                    'Score': scores,
+                    'Price': arr_price[valid],
+                    'Change (%)': np.round(arr_change[valid], 2),
+                    'Volume Spike (%)': np.round(vc, 2),
+                    'RSI': np.round(rsi_v, 2),
+                    'Position': np.where(cp > 0.7, "Near High", np.where(cp > 0.5, "Mid", "Near Low")),
+                    'VWAP Diff (%)': np.round(vw, 2),
+                    # right=True keeps pd.cut's closed-right bins: 40 is still Avoid.
+                    'Recommendation': _REC_LABELS[np.digitize(scores, _REC_THR, right=True)],
+                })
+
+                # Streamlit ships frames to the browser as Arrow; keeping the
+                # columns Arrow-backed from the start makes that a zero-copy
+                # handoff instead of a pandas->Arrow conversion per render.
+                if pl is not None:
+                    # Multithreaded Rust sort; pandas only for display.
+                    df = (pl.from_pandas(feat_df).sort('Score', descending=True)
+                            .to_pandas(use_pyarrow_extension_array=pa is not None))
+                else:
+                    df = feat_df.sort_values("Score", ascending=False).reset_index(drop=True)
+                    if pa is not None:
+                        df = df.convert_dtypes(dtype_backend='pyarrow')
 
                 st.success(f"Scan Complete! Market: {market_strength}")
                 top_picks = df[df['Recommendation'].isin(['Strong Buy', 'Watch'])]
@@ -215,7 +588,13 @@ if st.button("🔍 Scan BTST Opportunities"):
                 else:
                     st.info("No strong picks found today.")
 
-                csv = df.to_csv(index=False)
+                if pa is not None:
+                    # Multithreaded C writer; no per-row Python string formatting.
+                    buf = io.BytesIO()
+                    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buf)
+                    csv = buf.getvalue()
+                else:
+                    csv = df.to_csv(index=False)
                 st.download_button("📥 Download Full Results", data=csv, file_name="btst_results.csv", mime="text/csv")
 
                 st.subheader("📊 Analysis Dashboard")
@@ -228,7 +607,12 @@ if st.button("🔍 Scan BTST Opportunities"):
 
                 st.write("Feature Correlations")
                 if len(df) > 1:
-                    corr_df = df[['Score', 'Change (%)', 'Volume Spike (%)', 'RSI', 'VWAP Diff (%)']].corr()
+                    corr_cols = ['Score', 'Change (%)', 'Volume Spike (%)', 'RSI', 'VWAP Diff (%)']
+                    if pl is not None:
+                        corr_df = pl.from_pandas(df[corr_cols]).corr().to_pandas()
+                        corr_df.index = corr_cols
+                    else:
+                        corr_df = df[corr_cols].corr()
                     st.dataframe(corr_df.style.background_gradient(cmap='coolwarm', axis=None))
             else:
                 st.warning("No valid stock data found.")
@@ -0,0 +1,302 @@
+"""Low-level indicator kernels for the BTST scanner.
+
+Single-pass loop kernels compiled with numba when it is installed, with
+vectorized scipy/numpy implementations as the fallback. Both paths produce
+the same values (EMA recurrences seeded from the first sample, Wilder
+smoothing for RSI) so results don't depend on which one ran.
+"""
+import numpy as np
+from scipy.signal import lfilter
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """No-op decorator so everything still runs without numba."""
+        if args and callable(args[0]):
+            return args[0]
+        def wrap(func):
+            return func
+        return wrap
+
+# ---------- numba loop kernels ---------- #
+@njit(cache=True)
+def _ema_loop(x, n):
+    alpha = 2.0 / (n + 1.0)
+    out = np.empty_like(x)
+    e = x[0]
+    for i in range(x.shape[0]):
+        e += alpha * (x[i] - e)
+        out[i] = e
+    return out
+
+@njit(cache=True)
+def _rsi_loop(x, n):
+    wilder = 1.0 / n
+    out = np.empty_like(x)
+    out[0] = 50.0
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, x.shape[0]):
+        delta = x[i] - x[i - 1]
+        gain = delta if delta > 0.0 else 0.0
+        loss = -delta if delta < 0.0 else 0.0
+        if i == 1:
+            avg_gain = gain
+            avg_loss = loss
+        else:
+            avg_gain += wilder * (gain - avg_gain)
+            avg_loss += wilder * (loss - avg_loss)
+        denom = avg_loss if avg_loss > 1e-12 else 1e-12
+        out[i] = 100.0 - 100.0 / (1.0 + avg_gain / denom)
+    return out
+
+@njit(cache=True)
+def _macd_diff_loop(x):
+    a12, a26, a9 = 2.0 / 13.0, 2.0 / 27.0, 2.0 / 10.0
+    out = np.empty_like(x)
+    e12 = x[0]
+    e26 = x[0]
+    signal = 0.0
+    for i in range(x.shape[0]):
+        e12 += a12 * (x[i] - e12)
+        e26 += a26 * (x[i] - e26)
+        macd = e12 - e26
+        signal += a9 * (macd - signal)
+        out[i] = macd - signal
+    return out
+
+@njit(cache=True)
+def _momentum_final_loop(x, n):
+    """One fused pass over close: final RSI and MACD histogram values.
+
+    RSI and MACD both walk the same close array; computing them together
+    halves the passes and skips the output-array allocations entirely since
+    only the last value of each is ever scored.
+    """
+    wilder = 1.0 / n
+    a12, a26, a9 = 2.0 / 13.0, 2.0 / 27.0, 2.0 / 10.0
+    avg_gain = 0.0
+    avg_loss = 0.0
+    e12 = x[0]
+    e26 = x[0]
+    signal = 0.0
+    for i in range(x.shape[0]):
+        c = x[i]
+        e12 += a12 * (c - e12)
+        e26 += a26 * (c - e26)
+        signal += a9 * ((e12 - e26) - signal)
+        if i > 0:
+            delta = c - x[i - 1]
+            gain = delta if delta > 0.0 else 0.0
+            loss = -delta if delta < 0.0 else 0.0
+            if i == 1:
+                avg_gain = gain
+                avg_loss = loss
+            else:
+                avg_gain += wilder * (gain - avg_gain)
+                avg_loss += wilder * (loss - avg_loss)
+    rsi_val = 50.0
+    if x.shape[0] > 1:
+        denom = avg_loss if avg_loss > 1e-12 else 1e-12
+        rsi_val = 100.0 - 100.0 / (1.0 + avg_gain / denom)
+    return rsi_val, (e12 - e26) - signal
+
+@njit(cache=True)
+def _vwap_kernel(high, low, close, volume):
+    """Fused single pass over OHLCV: final VWAP diff and close position.
+
+    Reads each cache line once instead of materializing typical-price,
+    price*volume and two cumulative arrays separately.
+    """
+    sum_pv = 0.0
+    sum_v = 0.0
+    for i in range(close.shape[0]):
+        tp = (high[i] + low[i] + close[i]) / 3.0
+        sum_pv += tp * volume[i]
+        sum_v += volume[i]
+    c = close[-1]
+    if sum_v > 0:
+        vwap = sum_pv / sum_v
+        vwap_diff = (c - vwap) / (vwap + 1e-8) * 100.0
+    else:
+        vwap_diff = 0.0
+    close_pos = (c - low[-1]) / (high[-1] - low[-1] + 1e-8)
+    return vwap_diff, close_pos
+
+@njit(cache=True, parallel=True)
+def _scan_all_loop(high, low, close, volume, lengths, rsi_n, bb_n, vol_n, tail):
+    """Latest-bar features for every symbol in one parallel pass.
+
+    Inputs are (n_symbols, max_bars) float32 arrays padded past each symbol's
+    `lengths[s]`. Returns the (7, n_symbols) float32 feature matrix in scoring
+    order plus a (7, n_symbols) float64 matrix of the recurrence accumulators
+    (ema12, ema26, macd signal, avg gain/loss, vwap sums) so callers can seed
+    streaming state without re-walking the bars in Python.
+    """
+    count = lengths.shape[0]
+    feats = np.empty((7, count), dtype=np.float32)
+    accum = np.empty((7, count), dtype=np.float64)
+    for s in prange(count):
+        n = lengths[s]
+
+        pc = 0.0
+        if n > 1 and close[s, n - 2] > 0:
+            pc = (close[s, n - 1] - close[s, n - 2]) / close[s, n - 2] * 100.0
+
+        w = vol_n if vol_n < n - 1 else n - 1
+        vchg = 0.0
+        if w > 1:
+            sv = 0.0
+            for i in range(n - w, n):
+                sv += volume[s, i]
+            va = sv / w
+            if va > 0:
+                vchg = (volume[s, n - 1] / va - 1.0) * 100.0
+
+        sum_pv = 0.0
+        sum_v = 0.0
+        for i in range(n):
+            tp = (high[s, i] + low[s, i] + close[s, i]) / 3.0
+            sum_pv += tp * volume[s, i]
+            sum_v += volume[s, i]
+        if sum_v > 0:
+            vwap = sum_pv / sum_v
+            vdiff = (close[s, n - 1] - vwap) / (vwap + 1e-8) * 100.0
+        else:
+            vdiff = 0.0
+        cpos = (close[s, n - 1] - low[s, n - 1]) / (high[s, n - 1] - low[s, n - 1] + 1e-8)
+
+        start = n - tail if n > tail else 0
+        rsi_w = rsi_n if rsi_n < n - 1 else n - 1
+        wilder = 1.0 / rsi_w if rsi_w > 0 else 1.0
+        a12, a26, a9 = 2.0 / 13.0, 2.0 / 27.0, 2.0 / 10.0
+        e12 = close[s, start]
+        e26 = close[s, start]
+        signal = 0.0
+        avg_gain = 0.0
+        avg_loss = 0.0
+        k = 0
+        for i in range(start, n):
+            c = close[s, i]
+            e12 += a12 * (c - e12)
+            e26 += a26 * (c - e26)
+            signal += a9 * ((e12 - e26) - signal)
+            if k > 0:
+                delta = c - close[s, i - 1]
+                gain = delta if delta > 0.0 else 0.0
+                loss = -delta if delta < 0.0 else 0.0
+                if k == 1:
+                    avg_gain = gain
+                    avg_loss = loss
+                else:
+                    avg_gain += wilder * (gain - avg_gain)
+                    avg_loss += wilder * (loss - avg_loss)
+            k += 1
+        if rsi_w > 1:
+            denom = avg_loss if avg_loss > 1e-12 else 1e-12
+            rsi_val = 100.0 - 100.0 / (1.0 + avg_gain / denom)
+        else:
+            rsi_val = 50.0
+        macd_val = (e12 - e26) - signal
+
+        bbw = 0.0
+        if n > bb_n:
+            mean = 0.0
+            for i in range(n - bb_n, n):
+                mean += close[s, i]
+            mean /= bb_n
+            var = 0.0
+            for i in range(n - bb_n, n):
+                d = close[s, i] - mean
+                var += d * d
+            var /= bb_n
+            denom_m = mean if mean > 1e-12 else 1e-12
+            bbw = 4.0 * (var ** 0.5) / denom_m * 100.0
+
+        feats[0, s] = pc
+        feats[1, s] = vchg
+        feats[2, s] = rsi_val
+        feats[3, s] = macd_val
+        feats[4, s] = bbw
+        feats[5, s] = cpos
+        feats[6, s] = vdiff
+        accum[0, s] = e12
+        accum[1, s] = e26
+        accum[2, s] = signal
+        accum[3, s] = avg_gain
+        accum[4, s] = avg_loss
+        accum[5, s] = sum_pv
+        accum[6, s] = sum_v
+    return feats, accum
+
+# ---------- vectorized fallbacks ---------- #
+def _ewm(x, alpha):
+    """Exponentially weighted mean (adjust=False) as one lfilter pass."""
+    zi = np.array([(1.0 - alpha) * x[0]])
+    y, _ = lfilter([alpha], [1.0, -(1.0 - alpha)], x, zi=zi)
+    return y
+
+# ---------- public API ---------- #
+def ema(x, n):
+    if NUMBA_AVAILABLE:
+        return _ema_loop(x, n)
+    return _ewm(x, 2.0 / (n + 1.0))
+
+def rsi(x, n=14):
+    """Wilder RSI over a raw close array (first bar padded to neutral 50)."""
+    if NUMBA_AVAILABLE:
+        return _rsi_loop(x, n)
+    delta = np.diff(x)
+    avg_gain = _ewm(np.maximum(delta, 0.0), 1.0 / n)
+    avg_loss = _ewm(np.maximum(-delta, 0.0), 1.0 / n)
+    rs = avg_gain / np.maximum(avg_loss, 1e-12)
+    return np.concatenate(([50.0], 100.0 - 100.0 / (1.0 + rs)))
+
+def macd_diff(x):
+    """MACD histogram (MACD line minus its 9-period signal line)."""
+    if NUMBA_AVAILABLE:
+        return _macd_diff_loop(x)
+    macd = _ewm(x, 2.0 / 13.0) - _ewm(x, 2.0 / 27.0)
+    return macd - _ewm(macd, 2.0 / 10.0)
+
+def momentum_final(x, n=14):
+    """Final RSI and MACD histogram values from one fused pass."""
+    if NUMBA_AVAILABLE:
+        return _momentum_final_loop(x, n)
+    return float(rsi(x, n)[-1]), float(macd_diff(x)[-1])
+
+def bb_width(x, n=20):
+    """Bollinger band width in percent of the last n-bar window."""
+    # float64 just for the variance reduction; E[x^2] - E[x]^2 on float32
+    # cancels catastrophically for large price levels.
+    tail = x[-n:].astype(np.float64)
+    mean = tail.mean()
+    var = np.dot(tail, tail) / n - mean * mean
+    std = np.sqrt(var if var > 0.0 else 0.0)
+    return 4.0 * std / max(mean, 1e-12) * 100.0
+
+def scan_all(high, low, close, volume, lengths, rsi_n=14, bb_n=20, vol_n=10, tail=80):
+    """Batched latest-features pass across the whole universe (numba only).
+
+    Callers should fall back to the per-symbol path when NUMBA_AVAILABLE is
+    False — a pure-Python symbol loop here would be slower than that path.
+    """
+    return _scan_all_loop(high, low, close, volume, lengths, rsi_n, bb_n, vol_n, tail)
+
+def vwap_close(high, low, close, volume):
+    """Final VWAP diff (%) and close position, fused kernel or numpy sums."""
+    if NUMBA_AVAILABLE:
+        return _vwap_kernel(high, low, close, volume)
+    sum_v = volume.sum()
+    if sum_v > 0:
+        vwap = np.dot(high + low + close, volume) / (3.0 * sum_v)
+        vwap_diff = (close[-1] - vwap) / (vwap + 1e-8) * 100.0
+    else:
+        vwap_diff = 0.0
+    close_pos = (close[-1] - low[-1]) / (high[-1] - low[-1] + 1e-8)
+    return vwap_diff, close_pos